@@ -1,4 +1,8 @@
 # pyright: reportUnusedImport=false
-from .consts import allowed_unit, unit
+from .allocator import allocator
+from .consts import allowed_unit, crossing, overflow, unit
 from .device import device
+from .rollup import rollup
 from .scan import scan
+from .server import server
+from .trigger import trigger
@@ -0,0 +1,347 @@
+from __future__ import annotations
+import argparse
+import asyncio
+import contextlib
+import os
+import re
+import statistics
+import sys
+import time
+import typing
+from . import consts
+from .allocator import allocator
+from .device import device
+from .protocol import protocol
+from .rollup import rollup
+from .scan import scan as scan_devices
+
+ADDR_FORMAT = re.compile("^([0-9a-fA-F]{2}:){5}[0-9a-fA-F]{2}$")
+
+
+def ble_mac(addr: str) -> str:
+    if ADDR_FORMAT.match(addr):
+        return addr.upper()
+    raise argparse.ArgumentTypeError(f"Invalid BLE MAC address '{addr}'")
+
+
+class output:
+    CSV_HEADER = b"time,scale,weight,unit,stable\n"
+
+    __broken: asyncio.Event
+    __csv: bool
+    __file: typing.BinaryIO
+    __flush_period: float
+    __lines: int
+    __task: asyncio.Task[None] | None
+
+    @property
+    def broken(self: output) -> asyncio.Event:
+        return self.__broken
+
+    @property
+    def lines(self: output) -> int:
+        return self.__lines
+
+    def __init__(
+        self: output, fd: int, csv: bool, buffer_size: int, flush_period: float
+    ) -> None:
+        self.__broken = asyncio.Event()
+        self.__csv = csv
+        self.__file = open(fd, "wb", buffer_size, closefd=False)
+        self.__flush_period = flush_period
+        self.__lines = 0
+        self.__task = None
+        if csv:
+            self.__write(output.CSV_HEADER)
+
+    def close(self: output) -> None:
+        if self.__task is not None:
+            self.__task.cancel()
+            self.__task = None
+        if not self.__broken.is_set():
+            with contextlib.suppress(BrokenPipeError):
+                self.__file.flush()
+
+    def listener(self: output, name: str) -> typing.Callable[[protocol.state], None]:
+        if self.__csv:
+            template = "%.6f," + name + ",%r,%s,%d\n"
+
+            def write(state: protocol.state) -> None:
+                self.__write(
+                    (
+                        template
+                        % (time.time(), state.weight, state.unit.name, state.stable)
+                    ).encode()
+                )
+
+        else:
+            template = (
+                '{"time":%.6f,"scale":"'
+                + name
+                + '","weight":%r,"unit":"%s","stable":%s}\n'
+            )
+
+            def write(state: protocol.state) -> None:
+                self.__write(
+                    (
+                        template
+                        % (
+                            time.time(),
+                            state.weight,
+                            state.unit.name,
+                            "true" if state.stable else "false",
+                        )
+                    ).encode()
+                )
+
+        return write
+
+    def start(self: output) -> None:
+        self.__task = asyncio.get_running_loop().create_task(self.__flush_loop())
+
+    async def __flush_loop(self: output) -> None:
+        while not self.__broken.is_set():
+            await asyncio.sleep(self.__flush_period)
+            try:
+                self.__file.flush()
+            except BrokenPipeError:
+                self.__broken.set()
+
+    def __write(self: output, data: bytes) -> None:
+        if self.__broken.is_set():
+            return
+        try:
+            self.__file.write(data)
+        except BrokenPipeError:
+            self.__broken.set()
+            return
+        self.__lines += 1
+
+
+def adapter_for(adapters: list[str] | None) -> str | allocator | None:
+    if adapters is None or len(adapters) == 0:
+        return None
+    elif len(adapters) == 1:
+        return adapters[0]
+    return allocator(adapters)
+
+
+async def follow(
+    addr: str,
+    adapter: str | allocator | None,
+    listener: typing.Callable[[protocol.state], None],
+) -> bool:
+    print(f"Connecting to {addr}...", file=sys.stderr)
+    try:
+        async with device(addr, adapter=adapter) as dev:
+            print(
+                f"Connected to {addr} on {dev.adapter or 'default adapter'}",
+                file=sys.stderr,
+            )
+            dev.add_listener(listener)
+            try:
+                while dev.is_connected:
+                    await dev.wait()
+            finally:
+                dev.remove_listener(listener)
+    except Exception as exc:
+        print(f"Failed to follow {addr}: {exc}", file=sys.stderr)
+        return False
+    print(f"Disconnected from {addr}", file=sys.stderr)
+    return True
+
+
+async def scan(args: argparse.Namespace) -> None:
+    async for addr in scan_devices(args.timeout, args.adapter):
+        print(addr, flush=True)
+
+
+async def stream(args: argparse.Namespace) -> None:
+    sys.stdout.flush()
+    out = output(sys.stdout.fileno(), args.format == "csv", args.buffer, args.flush)
+    adapter = adapter_for(args.adapter)
+    out.start()
+    scales = asyncio.gather(
+        *(follow(addr, adapter, out.listener(addr)) for addr in args.addr)
+    )
+    broken = asyncio.ensure_future(out.broken.wait())
+    try:
+        await asyncio.wait((scales, broken), return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in (scales, broken):
+            task.cancel()
+        await asyncio.gather(scales, broken, return_exceptions=True)
+        out.close()
+    if out.broken.is_set():
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+    elif not all(scales.result()):
+        sys.exit(1)
+
+
+async def record(args: argparse.Namespace) -> None:
+    adapter = adapter_for(args.adapter)
+    with contextlib.ExitStack() as stack:
+        stores = [
+            stack.enter_context(
+                rollup(args.dir, addr.replace(":", ""), args.resolutions)
+            )
+            for addr in args.addr
+        ]
+
+        async def flush_loop() -> None:
+            while True:
+                await asyncio.sleep(args.flush)
+                for store in stores:
+                    store.flush()
+
+        flusher = asyncio.get_running_loop().create_task(flush_loop())
+        try:
+            results = await asyncio.gather(
+                *(
+                    follow(addr, adapter, store.update)
+                    for addr, store in zip(args.addr, stores)
+                )
+            )
+        finally:
+            flusher.cancel()
+    if not all(results):
+        sys.exit(1)
+
+
+async def bench(args: argparse.Namespace) -> None:
+    null = os.open(os.devnull, os.O_WRONLY)
+    out = output(null, args.format == "csv", args.buffer, args.flush)
+    write = out.listener("00:00:00:00:00:00")
+    state = protocol.state(True, True, consts.unit.gram, 123.4, 0.0)
+    start = time.perf_counter()
+    for _ in range(args.lines):
+        write(state)
+    elapsed = time.perf_counter() - start
+    out.close()
+    os.close(null)
+    print(f"Formatted {args.lines / elapsed:.0f} {args.format} lines per second")
+
+    adapter = adapter_for(args.adapter)
+    for addr in args.addr:
+        async with device(addr, pause_after=0.5, adapter=adapter) as dev:
+            latencies: list[float] = []
+
+            def measure(state: protocol.state) -> None:
+                latencies.append(time.perf_counter() - state.timestamp)
+
+            dev.add_listener(measure)
+            await asyncio.sleep(args.duration)
+            dev.remove_listener(measure)
+            print(
+                f"{addr}: {len(latencies) / args.duration:.1f} notifications/s, "
+                f"decode latency mean {statistics.mean(latencies or [0]) * 1e6:.0f} us, "
+                f"max {max(latencies, default=0) * 1e6:.0f} us"
+            )
+            while dev.is_connected and not dev.is_paused:
+                await asyncio.sleep(0.1)
+            if dev.is_connected:
+                await dev.wait()
+            if dev.is_connected:
+                print(f"{addr}: resumed in {dev.resume_latency * 1000:.1f} ms")
+            else:
+                print(f"{addr}: disconnected before resuming", file=sys.stderr)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m ens_c551s",
+        description="stream and record Etekcity ENS-C551S smart kitchen scales",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_adapter(parser: argparse.ArgumentParser) -> None:
+        parser.add_argument(
+            "--adapter",
+            action="append",
+            help="the BLE adapter to use (repeat to spread scales across adapters)",
+            metavar="hciN",
+        )
+
+    def add_output(parser: argparse.ArgumentParser) -> None:
+        parser.add_argument(
+            "--buffer",
+            default=0x10000,
+            type=int,
+            help="the output buffer size",
+            metavar="BYTES",
+        )
+        parser.add_argument(
+            "--flush",
+            default=0.5,
+            type=float,
+            help="how often to flush buffered output",
+            metavar="SECONDS",
+        )
+        parser.add_argument("--format", choices=["csv", "jsonl"], default="jsonl")
+
+    def add_addrs(parser: argparse.ArgumentParser, nargs: str) -> None:
+        parser.add_argument(
+            "addr",
+            nargs=nargs,
+            type=ble_mac,
+            help="the BLE MAC addresses of the scales to connect to",
+            metavar="XX:XX:XX:XX:XX:XX",
+        )
+
+    command = commands.add_parser("scan", help="find nearby scales")
+    command.add_argument("--adapter", help="the BLE adapter to use", metavar="hciN")
+    command.add_argument(
+        "--timeout", default=10.0, type=float, help="how long to scan for"
+    )
+    command.set_defaults(run=scan)
+
+    command = commands.add_parser("stream", help="write readings to stdout")
+    add_adapter(command)
+    add_output(command)
+    add_addrs(command, "+")
+    command.set_defaults(run=stream)
+
+    command = commands.add_parser("record", help="record rolled up readings")
+    add_adapter(command)
+    command.add_argument("--dir", default=".", help="where to store the rollup files")
+    command.add_argument(
+        "--flush",
+        default=5.0,
+        type=float,
+        help="how often to flush recorded buckets to disk",
+        metavar="SECONDS",
+    )
+    command.add_argument(
+        "--resolutions",
+        default=[1.0, 60.0, 3600.0],
+        nargs="+",
+        type=float,
+        help="the bucket sizes to keep",
+        metavar="SECONDS",
+    )
+    add_addrs(command, "+")
+    command.set_defaults(run=record)
+
+    command = commands.add_parser("bench", help="measure streaming throughput")
+    add_adapter(command)
+    add_output(command)
+    command.add_argument(
+        "--duration",
+        default=10.0,
+        type=float,
+        help="how long to measure each scale",
+        metavar="SECONDS",
+    )
+    command.add_argument(
+        "--lines", default=1000000, type=int, help="how many lines to format"
+    )
+    add_addrs(command, "*")
+    command.set_defaults(run=bench)
+
+    parsed = parser.parse_args()
+    with contextlib.suppress(KeyboardInterrupt):
+        asyncio.run(parsed.run(parsed))
+
+
+if __name__ == "__main__":
+    main()
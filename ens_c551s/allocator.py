@@ -0,0 +1,85 @@
+from __future__ import annotations
+import math
+import time
+import typing
+
+
+class allocator:
+    class load(typing.NamedTuple):
+        adapter: str
+        connections: int
+        rate: float
+
+    __adapters: dict[str, set[str]]
+    __capacity: int | None
+    __connection_cost: float
+    __placements: dict[str, str]
+    __rates: dict[str, tuple[float, float]]
+    __window: float
+
+    @property
+    def loads(self: allocator) -> list[allocator.load]:
+        now = time.monotonic()
+        return [
+            allocator.load(
+                adapter, len(addrs), sum(self.__rate(addr, now) for addr in addrs)
+            )
+            for adapter, addrs in self.__adapters.items()
+        ]
+
+    def __init__(
+        self: allocator,
+        adapters: typing.Iterable[str],
+        capacity: int | None = None,
+        window: float = 10.0,
+        connection_cost: float = 5.0,
+    ) -> None:
+        self.__adapters = {adapter: set() for adapter in adapters}
+        if len(self.__adapters) == 0:
+            raise ValueError("At least one adapter is required")
+        self.__capacity = capacity
+        self.__connection_cost = connection_cost
+        self.__placements = {}
+        self.__rates = {}
+        self.__window = window
+
+    def adapter(self: allocator, addr: str) -> str | None:
+        return self.__placements.get(addr)
+
+    def observe(
+        self: allocator, addr: str, count: int = 1, now: float | None = None
+    ) -> None:
+        if now is None:
+            now = time.monotonic()
+        self.__rates[addr] = (self.__rate(addr, now) + count / self.__window, now)
+
+    def place(self: allocator, addr: str) -> str:
+        self.release(addr)
+        now = time.monotonic()
+        available = [
+            adapter
+            for adapter, addrs in self.__adapters.items()
+            if self.__capacity is None or len(addrs) < self.__capacity
+        ]
+        if len(available) == 0:
+            raise RuntimeError("All adapters are at capacity")
+        adapter = min(
+            available,
+            key=lambda adapter: (
+                sum(self.__rate(other, now) for other in self.__adapters[adapter])
+                + self.__connection_cost * len(self.__adapters[adapter]),
+                len(self.__adapters[adapter]),
+            ),
+        )
+        self.__adapters[adapter].add(addr)
+        self.__placements[addr] = adapter
+        return adapter
+
+    def release(self: allocator, addr: str) -> None:
+        adapter = self.__placements.pop(addr, None)
+        if adapter is not None:
+            self.__adapters[adapter].discard(addr)
+
+    def __rate(self: allocator, addr: str, now: float) -> float:
+        rate, last = self.__rates.get(addr, (0.0, now))
+        return rate * math.exp((last - now) / self.__window)
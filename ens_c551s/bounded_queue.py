@@ -0,0 +1,98 @@
+from __future__ import annotations
+import asyncio
+import collections
+import typing
+from . import consts
+
+T = typing.TypeVar("T")
+
+
+class bounded_queue(typing.Generic[T]):
+    __closed: bool
+    __dropped: int
+    __items: collections.deque[T]
+    __maxlen: int
+    __peak: int
+    __policy: consts.overflow
+    __readable: asyncio.Event
+    __writable: asyncio.Event
+
+    @property
+    def closed(self: bounded_queue[T]) -> bool:
+        return self.__closed
+
+    @property
+    def dropped(self: bounded_queue[T]) -> int:
+        return self.__dropped
+
+    @property
+    def maxlen(self: bounded_queue[T]) -> int:
+        return self.__maxlen
+
+    @property
+    def peak(self: bounded_queue[T]) -> int:
+        return self.__peak
+
+    @property
+    def policy(self: bounded_queue[T]) -> consts.overflow:
+        return self.__policy
+
+    def __init__(
+        self,
+        maxlen: int,
+        policy: consts.overflow = consts.overflow.drop_oldest,
+    ) -> None:
+        if maxlen < 1:
+            raise ValueError("Queue length must be at least 1")
+        self.__closed = False
+        self.__dropped = 0
+        self.__items = collections.deque()
+        self.__maxlen = maxlen
+        self.__peak = 0
+        self.__policy = policy
+        self.__readable = asyncio.Event()
+        self.__writable = asyncio.Event()
+        self.__writable.set()
+
+    def __len__(self: bounded_queue[T]) -> int:
+        return len(self.__items)
+
+    def close(self: bounded_queue[T]) -> None:
+        self.__closed = True
+        self.__readable.set()
+        self.__writable.set()
+
+    async def get_batch(self: bounded_queue[T], limit: int) -> list[T]:
+        while len(self.__items) == 0:
+            if self.__closed:
+                return []
+            self.__readable.clear()
+            await self.__readable.wait()
+        count = min(limit, len(self.__items))
+        batch = [self.__items.popleft() for _ in range(count)]
+        self.__writable.set()
+        return batch
+
+    def put(self: bounded_queue[T], item: T) -> bool:
+        if self.__closed:
+            return False
+        if len(self.__items) >= self.__maxlen:
+            self.__dropped += 1
+            if self.__policy == consts.overflow.drop_newest:
+                return False
+            elif self.__policy == consts.overflow.drop_oldest:
+                self.__items.popleft()
+            else:
+                self.__items.clear()
+                self.close()
+                return False
+        self.__items.append(item)
+        self.__peak = max(self.__peak, len(self.__items))
+        self.__readable.set()
+        return True
+
+    async def put_wait(self: bounded_queue[T], item: T) -> bool:
+        while len(self.__items) >= self.__maxlen and not self.__closed:
+            self.__writable.clear()
+            await self.__writable.wait()
+        return self.put(item)
@@ -21,6 +21,17 @@ class command(enum.Enum):
     tare = 0xA185
 
 
+class crossing(enum.Enum):
+    rising = 0
+    falling = 1
+
+
+class overflow(enum.Enum):
+    drop_newest = 0
+    drop_oldest = 1
+    disconnect = 2
+
+
 class sign(enum.Enum):
     positive = 0
     negative = 1
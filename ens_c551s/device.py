@@ -1,27 +1,53 @@
 from __future__ import annotations
 import asyncio
+import bleak
 import contextlib
+import time
 import types
+import typing
 from . import consts
+from .allocator import allocator
 from .async_queue import async_queue
 from .protocol import protocol
+from .trigger import trigger, trigger_index
 
 
 class device(contextlib.AbstractAsyncContextManager["device"]):
     NEVER_TIMEOUT = 0
 
+    __adapter: str | None
+    __addr: str
+    __allocator: allocator | None
     __allowed_units: consts.allowed_unit
     __event: asyncio.Event
     __hardware_ver: str
     __is_connected: bool
+    __is_paused: bool
+    __is_running: bool
     __is_stable: bool
+    __listeners: list[typing.Callable[[protocol.state], None]]
+    __pause_after: float | None
+    __pause_handle: asyncio.TimerHandle | None
     __proto: protocol
     __queue: async_queue
+    __readers: int
+    __resume_latency: float
+    __resumed: float | None
     __software_ver: str
+    __stable_triggers: trigger_index
     __timeout: int
+    __triggers: trigger_index
     __unit: consts.unit
     __weight: float
 
+    @property
+    def adapter(self: device) -> str | None:
+        return self.__adapter
+
+    @property
+    def addr(self: device) -> str:
+        return self.__addr
+
     @property
     def allowed_units(self: device) -> consts.allowed_unit:
         return self.__allowed_units
@@ -42,10 +68,22 @@ class device(contextlib.AbstractAsyncContextManager["device"]):
     def is_connected(self: device) -> bool:
         return self.__is_connected
 
+    @property
+    def is_paused(self: device) -> bool:
+        return self.__is_paused
+
     @property
     def is_stable(self: device) -> bool:
         return self.__is_stable
 
+    @property
+    def readers(self: device) -> int:
+        return self.__readers
+
+    @property
+    def resume_latency(self: device) -> float:
+        return self.__resume_latency
+
     @property
     def software_ver(self: device) -> str:
         return self.__software_ver
@@ -86,29 +124,69 @@ class device(contextlib.AbstractAsyncContextManager["device"]):
     def weight(self: device) -> float:
         return self.__weight
 
-    def __init__(self: device, addr: str) -> None:
+    def __init__(
+        self: device,
+        addr: str,
+        pause_after: float | None = 1.0,
+        adapter: str | allocator | None = None,
+        client_type: typing.Callable[..., bleak.BleakClient] = bleak.BleakClient,
+    ) -> None:
         super().__init__()
+        if isinstance(adapter, allocator):
+            self.__adapter = None
+            self.__allocator = adapter
+        else:
+            self.__adapter = adapter
+            self.__allocator = None
+        self.__addr = addr
         self.__event = asyncio.Event()
-        self.__proto = protocol(addr, self.__update)
+        self.__is_paused = False
+        self.__is_running = False
+        self.__listeners = []
+        self.__pause_after = pause_after
+        self.__pause_handle = None
+        self.__proto = protocol(addr, self.__update, client_type)
+        self.__readers = 0
+        self.__resume_latency = 0.0
+        self.__resumed = None
+        self.__stable_triggers = trigger_index()
+        self.__triggers = trigger_index()
 
     async def __aenter__(self: device) -> device:
         self.__queue = async_queue()
-        await self.__proto.connect()
-        self.__hardware_ver = await self.__proto.get_hw_rev()
-        self.__software_ver = await self.__proto.get_sw_rev()
-        await self.__proto.start_notify()
-        await self.__proto.start()
-        self.timeout = 30
-        self.allowed_units = (
-            consts.allowed_unit.ounce
-            | consts.allowed_unit.pound_ounce
-            | consts.allowed_unit.ounce_water
-            | consts.allowed_unit.ounce_milk
-            | consts.allowed_unit.gram
-            | consts.allowed_unit.ml_water
-            | consts.allowed_unit.ml_milk
-        )
-        await self.wait()
+        if self.__allocator is not None:
+            self.__adapter = self.__allocator.place(self.__addr)
+        try:
+            await self.__proto.connect(self.__adapter)
+            try:
+                self.__hardware_ver = await self.__proto.get_hw_rev()
+                self.__software_ver = await self.__proto.get_sw_rev()
+                await self.__proto.start_notify()
+                await self.__proto.start()
+                self.timeout = 30
+                self.allowed_units = (
+                    consts.allowed_unit.ounce
+                    | consts.allowed_unit.pound_ounce
+                    | consts.allowed_unit.ounce_water
+                    | consts.allowed_unit.ounce_milk
+                    | consts.allowed_unit.gram
+                    | consts.allowed_unit.ml_water
+                    | consts.allowed_unit.ml_milk
+                )
+                await self.wait()
+            except BaseException:
+                with contextlib.suppress(Exception):
+                    await self.__queue.close()
+                with contextlib.suppress(Exception):
+                    await self.__proto.disconnect()
+                raise
+        except BaseException:
+            if self.__allocator is not None:
+                self.__allocator.release(self.__addr)
+            raise
+        self.__is_running = True
+        if self.__readers == 0:
+            self.__schedule_pause()
         return self
 
     async def __aexit__(
@@ -117,12 +195,21 @@ class device(contextlib.AbstractAsyncContextManager["device"]):
         exc_value: BaseException | None,
         traceback: types.TracebackType | None,
     ) -> None:
+        self.__is_running = False
+        if self.__pause_handle is not None:
+            self.__pause_handle.cancel()
+            self.__pause_handle = None
+        self.__is_paused = False
+        self.__resumed = None
         await self.__queue.close()
         await self.__proto.disconnect()
+        if self.__allocator is not None:
+            self.__allocator.release(self.__addr)
+        self.__is_connected = False
+        self.__event.set()
         del (
             self.__allowed_units,
             self.__hardware_ver,
-            self.__is_connected,
             self.__is_stable,
             self.__queue,
             self.__software_ver,
@@ -131,16 +218,134 @@ class device(contextlib.AbstractAsyncContextManager["device"]):
             self.__weight,
         )
 
+    def __acquire(self: device) -> None:
+        self.__readers += 1
+        if self.__pause_handle is not None:
+            self.__pause_handle.cancel()
+            self.__pause_handle = None
+        if self.__is_paused:
+            self.__is_paused = False
+            self.__resumed = time.perf_counter()
+            self.__queue.queue(self.__proto.resume())
+
+    def __pause(self: device) -> None:
+        self.__pause_handle = None
+        if self.__readers == 0 and self.__is_connected and not self.__is_paused:
+            self.__is_paused = True
+            self.__event.clear()
+            self.__queue.queue(self.__proto.pause())
+
+    def __release(self: device) -> None:
+        self.__readers -= 1
+        if self.__readers == 0:
+            self.__schedule_pause()
+
+    def __schedule_pause(self: device) -> None:
+        if (
+            self.__is_running
+            and self.__pause_after is not None
+            and self.__pause_handle is None
+        ):
+            self.__pause_handle = asyncio.get_running_loop().call_later(
+                self.__pause_after, self.__pause
+            )
+
     def __update(self: device, state: protocol.state) -> None:
+        if self.__resumed is not None and state.connected:
+            self.__resume_latency = state.timestamp - self.__resumed
+            self.__resumed = None
         self.__is_connected = state.connected
         self.__is_stable = state.stable
         self.__unit = state.unit
         self.__weight = state.weight
+        if state.connected:
+            if self.__allocator is not None:
+                self.__allocator.observe(self.__addr)
+            self.__triggers.update(state, True)
+            self.__stable_triggers.update(state, state.stable)
+            for listener in tuple(self.__listeners):
+                try:
+                    listener(state)
+                except Exception as exc:
+                    asyncio.get_running_loop().call_exception_handler(
+                        {
+                            "message": "Unhandled exception in device listener",
+                            "exception": exc,
+                        }
+                    )
+        else:
+            exc = bleak.exc.BleakError("Not connected")
+            self.__triggers.reset(exc)
+            self.__stable_triggers.reset(exc)
         self.__event.set()
 
+    def add_listener(
+        self: device, callback: typing.Callable[[protocol.state], None]
+    ) -> None:
+        self.__acquire()
+        self.__listeners.append(callback)
+
+    def add_trigger(
+        self: device,
+        threshold: float,
+        direction: consts.crossing,
+        callback: typing.Callable[[trigger, protocol.state], None],
+        hysteresis: float = 0.0,
+        stable: bool = False,
+    ) -> trigger:
+        trg = trigger(threshold, direction, callback, None, hysteresis, stable)
+        self.__acquire()
+        (self.__stable_triggers if stable else self.__triggers).add(trg)
+        return trg
+
+    def remove_listener(
+        self: device, callback: typing.Callable[[protocol.state], None]
+    ) -> None:
+        if callback in self.__listeners:
+            self.__listeners.remove(callback)
+            self.__release()
+
+    def remove_trigger(self: device, trg: trigger) -> None:
+        index = self.__stable_triggers if trg.stable else self.__triggers
+        if trg in index:
+            index.remove(trg)
+            self.__release()
+
+    @contextlib.asynccontextmanager
+    async def subscribe(self: device) -> typing.AsyncGenerator[device, None]:
+        self.__acquire()
+        try:
+            yield self
+        finally:
+            self.__release()
+
     def tare(self: device) -> None:
         self.__queue.queue(self.__proto.tare())
 
     async def wait(self: device) -> None:
-        await self.__event.wait()
+        self.__acquire()
+        try:
+            await self.__event.wait()
+        finally:
+            self.__release()
         self.__event.clear()
+
+    async def wait_crossing(
+        self: device,
+        threshold: float,
+        direction: consts.crossing,
+        hysteresis: float = 0.0,
+        stable: bool = False,
+    ) -> protocol.state:
+        future: asyncio.Future[protocol.state] = (
+            asyncio.get_running_loop().create_future()
+        )
+        trg = trigger(threshold, direction, None, future, hysteresis, stable)
+        index = self.__stable_triggers if stable else self.__triggers
+        self.__acquire()
+        index.add(trg)
+        try:
+            return await future
+        finally:
+            index.remove(trg)
+            self.__release()
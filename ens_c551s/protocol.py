@@ -1,7 +1,9 @@
 from __future__ import annotations
+import asyncio
 import bleak
 import bleak.backends.characteristic
 import struct
+import time
 import typing
 from . import consts
 
@@ -22,21 +24,37 @@ class protocol:
         stable: bool
         unit: consts.unit
         weight: float
+        timestamp: float = 0.0
 
+    __addr: str
     __callback: typing.Callable[[state], None]
     __client: bleak.BleakClient
+    __client_type: typing.Callable[..., bleak.BleakClient]
+    __disconnecting: asyncio.Task[None] | None
+    __paused: bool
     __seq: int
 
     def __init__(
-        self: protocol, addr: str, callback: typing.Callable[[state], None]
+        self: protocol,
+        addr: str,
+        callback: typing.Callable[[state], None],
+        client_type: typing.Callable[..., bleak.BleakClient] = bleak.BleakClient,
     ) -> None:
+        self.__addr = addr
         self.__callback = callback
-        self.__client = bleak.BleakClient(
-            addr, lambda _: callback(protocol.state(False, False, consts.unit.ounce, 0))
-        )
+        self.__client_type = client_type
+        self.__disconnecting = None
+        self.__paused = False
         self.__seq = 1
 
-    async def connect(self: protocol) -> None:
+    async def connect(self: protocol, adapter: str | None = None) -> None:
+        callback = self.__callback
+
+        def disconnected(client: bleak.BleakClient) -> None:
+            callback(protocol.state(False, False, consts.unit.ounce, 0))
+
+        self.__client = self.__client_type(self.__addr, disconnected, adapter=adapter)
+        self.__paused = False
         await self.__client.connect()  # pyright: ignore[reportUnknownMemberType]
 
     async def disconnect(self: protocol) -> None:
@@ -65,6 +83,14 @@ class protocol:
     async def set_unit(self: protocol, unit: consts.unit) -> None:
         await self.__tx(consts.command.set_unit, "<H", unit.value)
 
+    async def pause(self: protocol) -> None:
+        self.__paused = True
+        await self.__client.stop_notify(consts.CHAR_RX)
+
+    async def resume(self: protocol) -> None:
+        self.__paused = False
+        await self.start_notify()
+
     async def start(self: protocol) -> None:
         await self.__tx(consts.command.power_on)
 
@@ -76,14 +102,18 @@ class protocol:
     async def tare(self: protocol) -> None:
         await self.__tx(consts.command.tare)
 
-    async def __rx(
+    def __rx(
         self: protocol,
         char: bleak.backends.characteristic.BleakGATTCharacteristic,
         data: bytearray,
     ) -> None:
+        timestamp = time.perf_counter()
         (id,) = struct.unpack_from("<H", data, 7)
         if id == consts.command.sleep.value:
-            await self.__client.disconnect()
+            if self.__disconnecting is None or self.__disconnecting.done():
+                self.__disconnecting = asyncio.ensure_future(self.disconnect())
+        elif self.__paused:
+            return
         elif id == consts.command.weight.value:
             sign, weight, unit, stable = struct.unpack_from("<BHH?", data, 10)
             unit = consts.unit(unit)
@@ -91,7 +121,7 @@ class protocol:
             if sign == consts.sign.negative.value:
                 weight = -weight
             weight *= UNIT_CALIBRATION[consts.unit.gram] / UNIT_CALIBRATION[unit]
-            self.__callback(protocol.state(True, stable, unit, weight))
+            self.__callback(protocol.state(True, stable, unit, weight, timestamp))
 
     async def __tx(
         self: protocol, cmd: consts.command, format: str = "", *values: int
@@ -0,0 +1,277 @@
+from __future__ import annotations
+import contextlib
+import math
+import os
+import struct
+import time
+import types
+import typing
+from .protocol import protocol
+
+RECORD = struct.Struct("<dIddddI")
+
+
+class aggregate:
+    __count: int
+    __last: float
+    __max: float
+    __min: float
+    __stable: int
+    __start: float
+    __sum: float
+
+    @property
+    def count(self: aggregate) -> int:
+        return self.__count
+
+    @property
+    def last(self: aggregate) -> float:
+        return self.__last
+
+    @property
+    def max(self: aggregate) -> float:
+        return self.__max
+
+    @property
+    def mean(self: aggregate) -> float:
+        if self.__count == 0:
+            return math.nan
+        return self.__sum / self.__count
+
+    @property
+    def min(self: aggregate) -> float:
+        return self.__min
+
+    @property
+    def stable_fraction(self: aggregate) -> float:
+        if self.__count == 0:
+            return math.nan
+        return self.__stable / self.__count
+
+    @property
+    def start(self: aggregate) -> float:
+        return self.__start
+
+    def __init__(self: aggregate, start: float) -> None:
+        self.__count = 0
+        self.__last = math.nan
+        self.__max = -math.inf
+        self.__min = math.inf
+        self.__stable = 0
+        self.__start = start
+        self.__sum = 0.0
+
+    def __repr__(self: aggregate) -> str:
+        return (
+            f"aggregate(start={self.__start}, count={self.__count}, min={self.__min}, "
+            f"max={self.__max}, mean={self.mean}, last={self.__last}, "
+            f"stable_fraction={self.stable_fraction})"
+        )
+
+    def add(self: aggregate, weight: float, stable: bool) -> None:
+        self.__count += 1
+        self.__last = weight
+        if weight > self.__max:
+            self.__max = weight
+        if weight < self.__min:
+            self.__min = weight
+        if stable:
+            self.__stable += 1
+        self.__sum += weight
+
+    def merge(self: aggregate, other: aggregate) -> None:
+        if other.__count == 0:
+            return
+        self.__count += other.__count
+        self.__last = other.__last
+        self.__max = max(self.__max, other.__max)
+        self.__min = min(self.__min, other.__min)
+        self.__stable += other.__stable
+        self.__sum += other.__sum
+
+    def pack(self: aggregate) -> bytes:
+        return RECORD.pack(
+            self.__start,
+            self.__count,
+            self.__min,
+            self.__max,
+            self.__sum,
+            self.__last,
+            self.__stable,
+        )
+
+    @staticmethod
+    def unpack(data: bytes) -> aggregate:
+        start, count, minimum, maximum, total, last, stable = RECORD.unpack(data)
+        agg = aggregate(start)
+        agg.__count = count
+        agg.__last = last
+        agg.__max = maximum
+        agg.__min = minimum
+        agg.__stable = stable
+        agg.__sum = total
+        return agg
+
+
+class rollup(contextlib.AbstractContextManager["rollup"]):
+    class level:
+        current: aggregate | None
+        file: typing.BinaryIO
+        last: float
+        path: str
+        resolution: float
+
+        def __init__(self: rollup.level, path: str, resolution: float) -> None:
+            self.current = None
+            self.file = open(path, "ab")
+            size = self.file.seek(0, os.SEEK_END)
+            size -= size % RECORD.size
+            self.file.truncate(size)
+            self.last = -math.inf
+            if size > 0:
+                with open(path, "rb") as file:
+                    file.seek(size - RECORD.size)
+                    self.last = aggregate.unpack(file.read(RECORD.size)).start
+            self.path = path
+            self.resolution = resolution
+
+    __levels: list[rollup.level]
+
+    @property
+    def resolutions(self: rollup) -> list[float]:
+        return [level.resolution for level in self.__levels]
+
+    def __init__(
+        self: rollup,
+        directory: str,
+        name: str,
+        resolutions: typing.Sequence[float] = (1.0, 60.0, 3600.0),
+    ) -> None:
+        super().__init__()
+        if len(resolutions) == 0:
+            raise ValueError("At least one resolution is required")
+        for finer, coarser in zip(resolutions, resolutions[1:]):
+            ratio = coarser / finer
+            if ratio <= 1 or not math.isclose(ratio, round(ratio)):
+                raise ValueError(
+                    "Each resolution must be a larger multiple of the previous one"
+                )
+        os.makedirs(directory, exist_ok=True)
+        self.__levels = [
+            rollup.level(os.path.join(directory, f"{name}-{res:g}s.bin"), res)
+            for res in resolutions
+        ]
+
+    def __exit__(
+        self: rollup,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: types.TracebackType | None,
+    ) -> None:
+        self.close()
+
+    def add(
+        self: rollup, weight: float, stable: bool, timestamp: float | None = None
+    ) -> None:
+        if timestamp is None:
+            timestamp = time.time()
+        level = self.__levels[0]
+        current = level.current
+        timestamp = max(timestamp, level.last if current is None else current.start)
+        if current is None or timestamp >= current.start + level.resolution:
+            if current is not None:
+                self.__finish(0)
+            current = aggregate(
+                math.floor(timestamp / level.resolution) * level.resolution
+            )
+            level.current = current
+        current.add(weight, stable)
+
+    def close(self: rollup) -> None:
+        for i in range(len(self.__levels)):
+            if self.__levels[i].current is not None:
+                self.__finish(i)
+        for level in self.__levels:
+            level.file.close()
+
+    def flush(self: rollup) -> None:
+        for level in self.__levels:
+            level.file.flush()
+
+    def read(
+        self: rollup, resolution: float, start: float, end: float
+    ) -> list[aggregate]:
+        for level in self.__levels:
+            if math.isclose(level.resolution, resolution):
+                break
+        else:
+            raise ValueError(f"No rollup at a resolution of {resolution} seconds")
+        level.file.flush()
+        result = rollup.read_file(level.path, start, end)
+        pending: dict[float, aggregate] = {}
+        for finer in reversed(self.__levels[: self.__levels.index(level) + 1]):
+            current = finer.current
+            if current is not None:
+                bucket = math.floor(current.start / resolution) * resolution
+                if bucket not in pending:
+                    pending[bucket] = aggregate(bucket)
+                pending[bucket].merge(current)
+        for bucket in sorted(pending):
+            if start <= bucket < end:
+                if len(result) > 0 and result[-1].start == bucket:
+                    result[-1].merge(pending[bucket])
+                else:
+                    result.append(pending[bucket])
+        return result
+
+    @staticmethod
+    def read_file(path: str, start: float, end: float) -> list[aggregate]:
+        result: list[aggregate] = []
+        with open(path, "rb") as file:
+            low = 0
+            high = os.fstat(file.fileno()).st_size // RECORD.size
+            while low < high:
+                mid = (low + high) // 2
+                file.seek(mid * RECORD.size)
+                (mid_start,) = struct.unpack_from("<d", file.read(RECORD.size))
+                if mid_start < start:
+                    low = mid + 1
+                else:
+                    high = mid
+            file.seek(low * RECORD.size)
+            while True:
+                data = file.read(RECORD.size)
+                if len(data) < RECORD.size:
+                    break
+                agg = aggregate.unpack(data)
+                if agg.start >= end:
+                    break
+                if len(result) > 0 and result[-1].start == agg.start:
+                    result[-1].merge(agg)
+                else:
+                    result.append(agg)
+        return result
+
+    def update(self: rollup, state: protocol.state) -> None:
+        self.add(state.weight, state.stable)
+
+    def __finish(self: rollup, index: int) -> None:
+        level = self.__levels[index]
+        finished = level.current
+        assert finished is not None
+        level.current = None
+        level.file.write(finished.pack())
+        if index + 1 < len(self.__levels):
+            coarser = self.__levels[index + 1]
+            current = coarser.current
+            if current is not None and finished.start >= (
+                current.start + coarser.resolution
+            ):
+                self.__finish(index + 1)
+                current = None
+            if current is None:
+                current = aggregate(
+                    math.floor(finished.start / coarser.resolution) * coarser.resolution
+                )
+                coarser.current = current
+            current.merge(finished)
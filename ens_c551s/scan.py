@@ -4,10 +4,12 @@ import typing
 from . import consts
 
 
-async def scan(timeout: float = 10.0) -> typing.AsyncGenerator[str, None]:
+async def scan(
+    timeout: float = 10.0, adapter: typing.Optional[str] = None
+) -> typing.AsyncGenerator[str, None]:
     deadline = time.time() + timeout
     seen: set[str] = set()
-    async with bleak.BleakScanner() as scanner:
+    async with bleak.BleakScanner(adapter=adapter) as scanner:
         async for dev, adv in scanner.advertisement_data():
             if dev.address not in seen:
                 seen.add(dev.address)
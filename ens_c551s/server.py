@@ -0,0 +1,300 @@
+from __future__ import annotations
+import asyncio
+import base64
+import contextlib
+import hashlib
+import json
+import socket
+import struct
+import time
+import types
+import typing
+from . import consts
+from .bounded_queue import bounded_queue
+from .device import device
+from .protocol import protocol
+
+WEBSOCKET_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+WEBSOCKET_MAX_PAYLOAD = 0x10000
+
+
+class server(contextlib.AbstractAsyncContextManager["server"]):
+    class client:
+        done: asyncio.Event
+        queue: bounded_queue[bytes]
+        reader: asyncio.StreamReader
+        websocket: bool
+        writer: asyncio.StreamWriter
+
+        def __init__(
+            self: server.client,
+            reader: asyncio.StreamReader,
+            writer: asyncio.StreamWriter,
+            websocket: bool,
+            queue_size: int,
+            policy: consts.overflow,
+        ) -> None:
+            self.done = asyncio.Event()
+            self.queue = bounded_queue(queue_size, policy)
+            self.reader = reader
+            self.websocket = websocket
+            self.writer = writer
+
+    class stats(typing.NamedTuple):
+        clients: int
+        published: int
+        dropped: int
+        disconnected: int
+
+    __clients: set[server.client]
+    __disconnected: int
+    __dropped: int
+    __host: str
+    __latest: dict[str, tuple[bytes, bytes]]
+    __policy: consts.overflow
+    __port: int
+    __published: int
+    __queue_size: int
+    __send_buffer: int
+    __server: asyncio.AbstractServer
+    __tasks: set[asyncio.Task[None]]
+
+    @property
+    def port(self: server) -> int:
+        return self.__port
+
+    @property
+    def statistics(self: server) -> server.stats:
+        return server.stats(
+            len(self.__clients),
+            self.__published,
+            self.__dropped + sum(c.queue.dropped for c in self.__clients),
+            self.__disconnected,
+        )
+
+    def __init__(
+        self: server,
+        host: str = "127.0.0.1",
+        port: int = 8080,
+        queue_size: int = 16,
+        policy: consts.overflow = consts.overflow.drop_oldest,
+        send_buffer: int = 0x10000,
+    ) -> None:
+        super().__init__()
+        self.__clients = set()
+        self.__disconnected = 0
+        self.__dropped = 0
+        self.__host = host
+        self.__latest = {}
+        self.__policy = policy
+        self.__port = port
+        self.__published = 0
+        self.__queue_size = queue_size
+        self.__send_buffer = send_buffer
+        self.__tasks = set()
+
+    async def __aenter__(self: server) -> server:
+        self.__server = await asyncio.start_server(
+            self.__handle, self.__host, self.__port, backlog=1024
+        )
+        self.__port = self.__server.sockets[0].getsockname()[1]
+        return self
+
+    async def __aexit__(
+        self: server,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: types.TracebackType | None,
+    ) -> None:
+        self.__server.close()
+        for task in self.__tasks:
+            task.cancel()
+        clients = list(self.__clients)
+        for client in clients:
+            server.__drop(client)
+        await asyncio.gather(*self.__tasks, return_exceptions=True)
+        await asyncio.gather(*(client.done.wait() for client in clients))
+        await self.__server.wait_closed()
+
+    def attach(self: server, name: str, dev: device) -> None:
+        def listener(state: protocol.state) -> None:
+            self.publish(name, state.weight, state.stable, state.unit)
+
+        async def forward() -> None:
+            dev.add_listener(listener)
+            try:
+                while dev.is_connected:
+                    await dev.wait()
+            finally:
+                dev.remove_listener(listener)
+                self.__latest.pop(name, None)
+
+        self.__spawn(forward())
+
+    def publish(
+        self: server, name: str, weight: float, stable: bool, unit: consts.unit
+    ) -> None:
+        payload = json.dumps(
+            {
+                "scale": name,
+                "stable": stable,
+                "time": time.time(),
+                "unit": unit.name,
+                "weight": weight,
+            },
+            separators=(",", ":"),
+        ).encode()
+        sse = b"event: weight\ndata: " + payload + b"\n\n"
+        ws = server.__ws_frame(0x1, payload)
+        self.__latest[name] = (sse, ws)
+        self.__published += 1
+        for client in self.__clients:
+            if not client.queue.put(ws if client.websocket else sse):
+                if client.queue.closed:
+                    server.__drop(client)
+
+    async def __handle(
+        self: server, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), 10.0)
+        except (
+            asyncio.IncompleteReadError,
+            asyncio.LimitOverrunError,
+            asyncio.TimeoutError,
+            OSError,
+        ):
+            writer.close()
+            return
+        lines = head.decode("latin-1").split("\r\n")
+        request = lines[0].split(" ")
+        headers: dict[str, str] = {}
+        for line in lines[1:]:
+            key, sep, value = line.partition(":")
+            if sep:
+                headers[key.strip().lower()] = value.strip()
+        path = request[1].split("?")[0] if len(request) == 3 else ""
+        if request[0] != "GET":
+            writer.write(
+                b"HTTP/1.1 405 Method Not Allowed\r\nContent-Length: 0\r\n\r\n"
+            )
+        elif headers.get("upgrade", "").lower() == "websocket" and path == "/ws":
+            key = headers.get("sec-websocket-key", "").encode()
+            if len(key) == 0:
+                writer.write(b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\n\r\n")
+            else:
+                accept = base64.b64encode(hashlib.sha1(key + WEBSOCKET_GUID).digest())
+                writer.write(
+                    b"HTTP/1.1 101 Switching Protocols\r\n"
+                    b"Upgrade: websocket\r\n"
+                    b"Connection: Upgrade\r\n"
+                    b"Sec-WebSocket-Accept: " + accept + b"\r\n\r\n"
+                )
+                await self.__serve(reader, writer, True)
+                return
+        elif path == "/events":
+            writer.write(
+                b"HTTP/1.1 200 OK\r\n"
+                b"Content-Type: text/event-stream\r\n"
+                b"Cache-Control: no-cache\r\n"
+                b"Connection: keep-alive\r\n\r\n"
+            )
+            await self.__serve(reader, writer, False)
+            return
+        else:
+            writer.write(b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\n\r\n")
+        with contextlib.suppress(OSError):
+            await writer.drain()
+        writer.close()
+
+    async def __pump(self: server, client: server.client) -> None:
+        while True:
+            batch = await client.queue.get_batch(self.__queue_size)
+            if len(batch) == 0:
+                break
+            client.writer.writelines(batch)
+            await client.writer.drain()
+
+    async def __receive(self: server, client: server.client) -> None:
+        reader = client.reader
+        while True:
+            if not client.websocket:
+                if len(await reader.read(0x1000)) == 0:
+                    break
+                continue
+            b0, b1 = await reader.readexactly(2)
+            opcode = b0 & 0x0F
+            length = b1 & 0x7F
+            if length == 126:
+                (length,) = struct.unpack("!H", await reader.readexactly(2))
+            elif length == 127:
+                (length,) = struct.unpack("!Q", await reader.readexactly(8))
+            if length > WEBSOCKET_MAX_PAYLOAD:
+                break
+            mask = await reader.readexactly(4) if b1 & 0x80 else b"\0\0\0\0"
+            payload = bytes(
+                b ^ mask[i % 4] for i, b in enumerate(await reader.readexactly(length))
+            )
+            if opcode == 0x8:
+                client.writer.write(server.__ws_frame(0x8, payload[:2]))
+                break
+            elif opcode == 0x9:
+                client.writer.write(server.__ws_frame(0xA, payload))
+
+    async def __serve(
+        self: server,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        websocket: bool,
+    ) -> None:
+        sock: socket.socket | None = writer.get_extra_info("socket")
+        if sock is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.__send_buffer)
+        writer.transport.set_write_buffer_limits(self.__send_buffer)
+        client = server.client(
+            reader, writer, websocket, self.__queue_size, self.__policy
+        )
+        for sse, ws in self.__latest.values():
+            client.queue.put(ws if websocket else sse)
+        self.__clients.add(client)
+        pump = asyncio.ensure_future(self.__pump(client))
+        receive = asyncio.ensure_future(self.__receive(client))
+        try:
+            await asyncio.wait((pump, receive), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            self.__clients.discard(client)
+            self.__dropped += client.queue.dropped
+            if (
+                client.queue.dropped > 0
+                and client.queue.policy == consts.overflow.disconnect
+            ):
+                self.__disconnected += 1
+            client.queue.close()
+            for task in (pump, receive):
+                task.cancel()
+            await asyncio.gather(pump, receive, return_exceptions=True)
+            writer.close()
+            client.done.set()
+
+    @staticmethod
+    def __drop(client: server.client) -> None:
+        client.queue.close()
+        client.writer.transport.abort()
+
+    def __spawn(
+        self: server, coroutine: typing.Coroutine[typing.Any, typing.Any, None]
+    ) -> None:
+        task = asyncio.get_running_loop().create_task(coroutine)
+        self.__tasks.add(task)
+        task.add_done_callback(self.__tasks.discard)
+
+    @staticmethod
+    def __ws_frame(opcode: int, payload: bytes) -> bytes:
+        length = len(payload)
+        if length < 126:
+            header = struct.pack("!BB", 0x80 | opcode, length)
+        elif length < 0x10000:
+            header = struct.pack("!BBH", 0x80 | opcode, 126, length)
+        else:
+            header = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+        return header + payload
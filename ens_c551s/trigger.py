@@ -0,0 +1,221 @@
+from __future__ import annotations
+import asyncio
+import bisect
+import time
+import typing
+from . import consts
+from .protocol import protocol
+
+
+class trigger:
+    __callback: typing.Callable[[trigger, protocol.state], None] | None
+    __direction: consts.crossing
+    __fired: int
+    __future: asyncio.Future[protocol.state] | None
+    __hysteresis: float
+    __latency: float
+    __latency_max: float
+    __latency_total: float
+    __stable: bool
+    __threshold: float
+
+    @property
+    def direction(self: trigger) -> consts.crossing:
+        return self.__direction
+
+    @property
+    def fired(self: trigger) -> int:
+        return self.__fired
+
+    @property
+    def hysteresis(self: trigger) -> float:
+        return self.__hysteresis
+
+    @property
+    def latency(self: trigger) -> float:
+        return self.__latency
+
+    @property
+    def max_latency(self: trigger) -> float:
+        return self.__latency_max
+
+    @property
+    def mean_latency(self: trigger) -> float:
+        if self.__fired == 0:
+            return 0.0
+        return self.__latency_total / self.__fired
+
+    @property
+    def oneshot(self: trigger) -> bool:
+        return self.__future is not None
+
+    @property
+    def stable(self: trigger) -> bool:
+        return self.__stable
+
+    @property
+    def threshold(self: trigger) -> float:
+        return self.__threshold
+
+    def __init__(
+        self: trigger,
+        threshold: float,
+        direction: consts.crossing,
+        callback: typing.Callable[[trigger, protocol.state], None] | None = None,
+        future: asyncio.Future[protocol.state] | None = None,
+        hysteresis: float = 0.0,
+        stable: bool = False,
+    ) -> None:
+        if hysteresis < 0:
+            raise ValueError("Hysteresis must not be negative")
+        self.__callback = callback
+        self.__direction = direction
+        self.__fired = 0
+        self.__future = future
+        self.__hysteresis = hysteresis
+        self.__latency = 0.0
+        self.__latency_max = 0.0
+        self.__latency_total = 0.0
+        self.__stable = stable
+        self.__threshold = threshold
+
+    def fail(self: trigger, exc: BaseException) -> None:
+        if self.__future is not None and not self.__future.done():
+            self.__future.set_exception(exc)
+
+    def fire(self: trigger, state: protocol.state) -> None:
+        latency = time.perf_counter() - state.timestamp
+        self.__fired += 1
+        self.__latency = latency
+        self.__latency_max = max(self.__latency_max, latency)
+        self.__latency_total += latency
+        if self.__future is not None and not self.__future.done():
+            self.__future.set_result(state)
+        if self.__callback is not None:
+            try:
+                self.__callback(self, state)
+            except Exception as exc:
+                asyncio.get_running_loop().call_exception_handler(
+                    {
+                        "message": "Unhandled exception in trigger callback",
+                        "exception": exc,
+                    }
+                )
+
+
+class trigger_index:
+    __armed_falling: list[tuple[float, int, trigger]]
+    __armed_rising: list[tuple[float, int, trigger]]
+    __disarmed_falling: list[tuple[float, int, trigger]]
+    __disarmed_rising: list[tuple[float, int, trigger]]
+    __entries: dict[
+        trigger, tuple[list[tuple[float, int, trigger]], tuple[float, int, trigger]]
+    ]
+    __seq: int
+    __weight: float | None
+
+    def __init__(self: trigger_index) -> None:
+        self.__armed_falling = []
+        self.__armed_rising = []
+        self.__disarmed_falling = []
+        self.__disarmed_rising = []
+        self.__entries = {}
+        self.__seq = 0
+        self.__weight = None
+
+    def __contains__(self: trigger_index, trg: trigger) -> bool:
+        return trg in self.__entries
+
+    def __len__(self: trigger_index) -> int:
+        return len(self.__entries)
+
+    def add(self: trigger_index, trg: trigger) -> None:
+        if trg in self.__entries:
+            return
+        weight = self.__weight
+        if trg.direction == consts.crossing.rising:
+            if weight is not None and weight >= trg.threshold:
+                self.__insert(
+                    self.__disarmed_rising, trg.threshold - trg.hysteresis, trg
+                )
+            else:
+                self.__insert(self.__armed_rising, trg.threshold, trg)
+        else:
+            if weight is not None and weight <= trg.threshold:
+                self.__insert(
+                    self.__disarmed_falling, trg.threshold + trg.hysteresis, trg
+                )
+            else:
+                self.__insert(self.__armed_falling, trg.threshold, trg)
+
+    def remove(self: trigger_index, trg: trigger) -> None:
+        entry = self.__entries.pop(trg, None)
+        if entry is not None:
+            entries, key = entry
+            del entries[bisect.bisect_left(entries, key)]
+
+    def reset(self: trigger_index, exc: BaseException) -> None:
+        self.__weight = None
+        failed = [trg for trg in self.__entries if trg.oneshot]
+        for trg in failed:
+            self.remove(trg)
+        for trg in failed:
+            trg.fail(exc)
+
+    def update(self: trigger_index, state: protocol.state, fire: bool) -> None:
+        weight = state.weight
+        initial = self.__weight is None
+        self.__weight = weight
+        if len(self.__entries) == 0:
+            return
+        if fire or initial:
+            end = bisect.bisect_right(self.__armed_rising, (weight, float("inf")))
+            if end > 0:
+                fired = self.__armed_rising[:end]
+                del self.__armed_rising[:end]
+                self.__fire(fired, self.__disarmed_rising, -1.0, state, not initial)
+            start = bisect.bisect_left(self.__armed_falling, (weight, -1))
+            if start < len(self.__armed_falling):
+                fired = self.__armed_falling[start:]
+                del self.__armed_falling[start:]
+                self.__fire(fired, self.__disarmed_falling, 1.0, state, not initial)
+        start = bisect.bisect_right(self.__disarmed_rising, (weight, float("inf")))
+        if start < len(self.__disarmed_rising):
+            rearmed = self.__disarmed_rising[start:]
+            del self.__disarmed_rising[start:]
+            for _, _, trg in rearmed:
+                self.__insert(self.__armed_rising, trg.threshold, trg)
+        end = bisect.bisect_left(self.__disarmed_falling, (weight, -1))
+        if end > 0:
+            rearmed = self.__disarmed_falling[:end]
+            del self.__disarmed_falling[:end]
+            for _, _, trg in rearmed:
+                self.__insert(self.__armed_falling, trg.threshold, trg)
+
+    def __fire(
+        self: trigger_index,
+        fired: list[tuple[float, int, trigger]],
+        disarmed: list[tuple[float, int, trigger]],
+        sign: float,
+        state: protocol.state,
+        notify: bool,
+    ) -> None:
+        for _, _, trg in fired:
+            if trg.oneshot and notify:
+                del self.__entries[trg]
+            else:
+                self.__insert(disarmed, trg.threshold + sign * trg.hysteresis, trg)
+        if notify:
+            for _, _, trg in fired:
+                trg.fire(state)
+
+    def __insert(
+        self: trigger_index,
+        entries: list[tuple[float, int, trigger]],
+        key: float,
+        trg: trigger,
+    ) -> None:
+        entry = (key, self.__seq, trg)
+        self.__seq += 1
+        bisect.insort(entries, entry)
+        self.__entries[trg] = (entries, entry)
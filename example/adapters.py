@@ -0,0 +1,77 @@
+from __future__ import annotations
+import argparse
+import asyncio
+import ens_c551s
+from .simulated import simulated_client
+
+
+async def hold(dev: ens_c551s.device, stop: asyncio.Event) -> None:
+    async with dev, dev.subscribe():
+        await stop.wait()
+
+
+def report(title: str, alloc: ens_c551s.allocator) -> None:
+    print(title)
+    for load in alloc.loads:
+        print(
+            f"  {load.adapter}: {load.connections} connections, "
+            f"{load.rate:.1f} notifications/s"
+        )
+
+
+async def run(
+    adapters: list[str], capacity: int | None, scales: int, duration: float
+) -> None:
+    alloc = ens_c551s.allocator(adapters, capacity, duration)
+    devs: list[ens_c551s.device] = []
+    for i in range(scales):
+        addr = f"00:00:00:00:00:{i:02X}"
+        simulated_client.rates[addr] = 50.0 if i % len(adapters) == 0 else 5.0
+        devs.append(
+            ens_c551s.device(
+                addr,
+                adapter=alloc,
+                client_type=simulated_client,  # pyright: ignore[reportArgumentType]
+            )
+        )
+    stops = {dev: asyncio.Event() for dev in devs}
+    tasks = {dev: asyncio.ensure_future(hold(dev, stops[dev])) for dev in devs}
+    await asyncio.sleep(duration)
+    report(f"After {duration} seconds:", alloc)
+
+    busiest = max(alloc.loads, key=lambda load: load.rate).adapter
+    moved = [dev for dev in devs if dev.adapter == busiest]
+    for dev in moved:
+        stops[dev].set()
+        await tasks[dev]
+    for dev in moved:
+        stops[dev] = asyncio.Event()
+        tasks[dev] = asyncio.ensure_future(hold(dev, stops[dev]))
+    await asyncio.sleep(duration)
+    report(f"After reconnecting the scales on {busiest}:", alloc)
+    for dev in moved:
+        print(f"  {dev.addr} moved from {busiest} to {dev.adapter}")
+
+    for stop in stops.values():
+        stop.set()
+    await asyncio.gather(*tasks.values())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="example of spreading simulated scales across BLE adapters"
+    )
+    parser.add_argument(
+        "--adapters",
+        default=["hci0", "hci1", "hci2"],
+        nargs="+",
+        help="the adapters to spread scales across",
+    )
+    parser.add_argument(
+        "--capacity", type=int, help="the maximum connections per adapter"
+    )
+    parser.add_argument("--duration", default=3.0, type=float, help="seconds")
+    parser.add_argument("--scales", default=9, type=int, help="simulated scales")
+    parsed = parser.parse_args()
+
+    asyncio.run(run(parsed.adapters, parsed.capacity, parsed.scales, parsed.duration))
@@ -11,12 +11,13 @@ async def connect(addr: str) -> None:
         print(f"Hardware revision = {dev.hardware_ver}", file=sys.stderr)
         print(f"Software revision = {dev.software_ver}", file=sys.stderr)
 
-        while dev.is_connected:
-            print(dev.weight)
-            try:
-                await asyncio.sleep(1)
-            except asyncio.exceptions.CancelledError:
-                break
+        async with dev.subscribe():
+            while dev.is_connected:
+                print(dev.weight)
+                try:
+                    await asyncio.sleep(1)
+                except asyncio.exceptions.CancelledError:
+                    break
 
 
 if __name__ == "__main__":
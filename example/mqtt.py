@@ -2,13 +2,18 @@ from __future__ import annotations
 import argparse
 import asyncio
 import bleak
+import contextlib
 import ens_c551s
 import getpass
 import json
 import keyring
 import paho.mqtt.client
+import paho.mqtt.properties
+import paho.mqtt.reasoncodes
 import re
+import sys
 import typing
+from ens_c551s.bounded_queue import bounded_queue
 from . import utils
 
 
@@ -80,7 +85,180 @@ class mqtt_addr:
             self.__user = group
 
 
-async def run(mqtt_addr: mqtt_addr, mqtt_ca: str | None, ble_addr: str) -> None:
+class mqtt_publisher:
+    class stats(typing.NamedTuple):
+        queued: int
+        peak: int
+        dropped: int
+        inflight: int
+        sent: int
+
+    __client: paho.mqtt.client.Client
+    __closed: asyncio.Event
+    __inflight: set[int]
+    __loop: asyncio.AbstractEventLoop
+    __max_inflight: int
+    __misc: asyncio.Task[None] | None
+    __queue: bounded_queue[tuple[str, bytes, int, bool]]
+    __sender: asyncio.Task[None]
+    __sent: int
+    __window: asyncio.Event
+
+    @property
+    def statistics(self: mqtt_publisher) -> mqtt_publisher.stats:
+        return mqtt_publisher.stats(
+            len(self.__queue),
+            self.__queue.peak,
+            self.__queue.dropped,
+            len(self.__inflight),
+            self.__sent,
+        )
+
+    def __init__(
+        self: mqtt_publisher,
+        client: paho.mqtt.client.Client,
+        queue_size: int,
+        policy: ens_c551s.overflow,
+        max_inflight: int = 20,
+    ) -> None:
+        self.__client = client
+        self.__closed = asyncio.Event()
+        self.__inflight = set()
+        self.__loop = asyncio.get_running_loop()
+        self.__max_inflight = max_inflight
+        self.__misc = None
+        self.__queue = bounded_queue(queue_size, policy)
+        self.__sender = self.__loop.create_task(self.__send())
+        self.__sent = 0
+        self.__window = asyncio.Event()
+        client.max_inflight_messages_set(max_inflight + 1)
+        client.on_publish = self.__on_publish
+        client.on_socket_close = self.__on_socket_close
+        client.on_socket_open = self.__on_socket_open
+        client.on_socket_register_write = self.__on_socket_register_write
+        client.on_socket_unregister_write = self.__on_socket_unregister_write
+
+    async def close(
+        self: mqtt_publisher,
+        timeout: float = 5.0,
+        final: tuple[str, bytes, int, bool] | None = None,
+    ) -> None:
+        self.__queue.close()
+        with contextlib.suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(self.__flush(), timeout)
+        self.__sender.cancel()
+        if final is not None:
+            self.__client.publish(*final)
+        self.__client.disconnect()
+        with contextlib.suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(self.__closed.wait(), timeout)
+        if self.__misc is not None:
+            self.__misc.cancel()
+
+    def publish(
+        self: mqtt_publisher,
+        topic: str,
+        payload: bytes,
+        qos: int = 0,
+        retain: bool = False,
+    ) -> bool:
+        return self.__queue.put((topic, payload, qos, retain))
+
+    async def publish_wait(
+        self: mqtt_publisher,
+        topic: str,
+        payload: bytes,
+        qos: int = 0,
+        retain: bool = False,
+    ) -> bool:
+        return await self.__queue.put_wait((topic, payload, qos, retain))
+
+    async def __flush(self: mqtt_publisher) -> None:
+        await self.__sender
+        while len(self.__inflight) > 0 and not self.__closed.is_set():
+            self.__window.clear()
+            await self.__window.wait()
+
+    async def __misc_loop(self: mqtt_publisher) -> None:
+        while self.__client.loop_misc() == paho.mqtt.client.MQTT_ERR_SUCCESS:
+            await asyncio.sleep(1.0)
+
+    def __on_publish(
+        self: mqtt_publisher,
+        client: paho.mqtt.client.Client,
+        userdata: None,
+        mid: int,
+        reason_code: paho.mqtt.reasoncodes.ReasonCode,
+        properties: paho.mqtt.properties.Properties,
+    ) -> None:
+        if mid in self.__inflight:
+            self.__inflight.remove(mid)
+            self.__sent += 1
+        self.__window.set()
+
+    def __on_socket_close(
+        self: mqtt_publisher,
+        client: paho.mqtt.client.Client,
+        userdata: None,
+        sock: paho.mqtt.client.SocketLike,
+    ) -> None:
+        self.__loop.remove_reader(sock)
+        self.__closed.set()
+        self.__window.set()
+
+    def __on_socket_open(
+        self: mqtt_publisher,
+        client: paho.mqtt.client.Client,
+        userdata: None,
+        sock: paho.mqtt.client.SocketLike,
+    ) -> None:
+        self.__loop.add_reader(sock, client.loop_read)
+        self.__misc = self.__loop.create_task(self.__misc_loop())
+
+    def __on_socket_register_write(
+        self: mqtt_publisher,
+        client: paho.mqtt.client.Client,
+        userdata: None,
+        sock: paho.mqtt.client.SocketLike,
+    ) -> None:
+        self.__loop.add_writer(sock, client.loop_write)
+
+    def __on_socket_unregister_write(
+        self: mqtt_publisher,
+        client: paho.mqtt.client.Client,
+        userdata: None,
+        sock: paho.mqtt.client.SocketLike,
+    ) -> None:
+        self.__loop.remove_writer(sock)
+
+    async def __send(self: mqtt_publisher) -> None:
+        while True:
+            batch = await self.__queue.get_batch(self.__max_inflight)
+            if len(batch) == 0:
+                break
+            for topic, payload, qos, retain in batch:
+                while len(self.__inflight) >= self.__max_inflight:
+                    if self.__closed.is_set():
+                        return
+                    self.__window.clear()
+                    await self.__window.wait()
+                if self.__closed.is_set():
+                    return
+                info = self.__client.publish(topic, payload, qos, retain)
+                if info.rc == paho.mqtt.client.MQTT_ERR_SUCCESS or (
+                    qos > 0 and info.rc == paho.mqtt.client.MQTT_ERR_NO_CONN
+                ):
+                    self.__inflight.add(info.mid)
+
+
+async def run(
+    mqtt_addr: mqtt_addr,
+    mqtt_ca: str | None,
+    ble_addr: str,
+    queue_size: int,
+    policy: ens_c551s.overflow,
+    stats_period: float | None,
+) -> None:
     ble_addr = ble_addr.upper()
     ble_addr_hex = ble_addr.replace(":", "")
     object_id = f"ENS-C551S_{ble_addr_hex}"
@@ -103,11 +281,18 @@ async def run(mqtt_addr: mqtt_addr, mqtt_ca: str | None, ble_addr: str) -> None:
         keyring.set_password(keyring_service, mqtt_addr.user, password)
     mqtt.username_pw_set(mqtt_addr.user, password)
     mqtt.will_set(f"{mqtt_addr.prefix}/{object_id}/availability", b"offline", 1, True)
+    publisher = mqtt_publisher(mqtt, queue_size, policy)
     mqtt.connect(mqtt_addr.hostname, mqtt_addr.port)
+
+    async def report() -> None:
+        while stats_period is not None:
+            await asyncio.sleep(stats_period)
+            print(publisher.statistics, file=sys.stderr)
+
+    reporter = asyncio.get_running_loop().create_task(report())
     try:
-        mqtt.loop_start()
         print("Connected to MQTT.")
-        mqtt.publish(
+        await publisher.publish_wait(
             f"{mqtt_addr.prefix}/{object_id}/availability", b"offline", 1, True
         )
         async with ens_c551s.device(ble_addr) as dev:
@@ -130,7 +315,7 @@ async def run(mqtt_addr: mqtt_addr, mqtt_ca: str | None, ble_addr: str) -> None:
                         "sw_version": "0.1.0",
                     },
                 }
-                mqtt.publish(
+                await publisher.publish_wait(
                     f"{mqtt_addr.prefix}/binary_sensor/{object_id}/config",
                     json.dumps(
                         {
@@ -145,7 +330,7 @@ async def run(mqtt_addr: mqtt_addr, mqtt_ca: str | None, ble_addr: str) -> None:
                     1,
                     True,
                 )
-                mqtt.publish(
+                await publisher.publish_wait(
                     f"{mqtt_addr.prefix}/button/{object_id}/config",
                     json.dumps(
                         {
@@ -159,7 +344,7 @@ async def run(mqtt_addr: mqtt_addr, mqtt_ca: str | None, ble_addr: str) -> None:
                     1,
                     True,
                 )
-                mqtt.publish(
+                await publisher.publish_wait(
                     f"{mqtt_addr.prefix}/sensor/{object_id}/config",
                     json.dumps(
                         {
@@ -177,7 +362,7 @@ async def run(mqtt_addr: mqtt_addr, mqtt_ca: str | None, ble_addr: str) -> None:
                     1,
                     True,
                 )
-                mqtt.publish(
+                await publisher.publish_wait(
                     f"{mqtt_addr.prefix}/{object_id}/availability", b"online", 1, True
                 )
 
@@ -206,14 +391,14 @@ async def run(mqtt_addr: mqtt_addr, mqtt_ca: str | None, ble_addr: str) -> None:
                     if not mqtt.is_connected():
                         print("MQTT disconnected.")
                         break
-                    mqtt.publish(
+                    publisher.publish(
                         f"{mqtt_addr.prefix}/sensor/{object_id}/state",
                         str(dev.weight).encode(),
                         1 if dev.is_stable else 0,
                     )
-                    mqtt.publish(
+                    publisher.publish(
                         f"{mqtt_addr.prefix}/binary_sensor/{object_id}/state",
-                        f"OFF" if dev.is_stable else f"ON",
+                        b"OFF" if dev.is_stable else b"ON",
                         1 if dev.is_stable else 0,
                     )
             finally:
@@ -222,10 +407,11 @@ async def run(mqtt_addr: mqtt_addr, mqtt_ca: str | None, ble_addr: str) -> None:
         if exc.args != ("Not connected",):
             raise
     finally:
-        mqtt.publish(
-            f"{mqtt_addr.prefix}/{object_id}/availability", b"offline", 1, True
+        reporter.cancel()
+        await publisher.close(
+            final=(f"{mqtt_addr.prefix}/{object_id}/availability", b"offline", 1, True)
         )
-        mqtt.disconnect()
+        print(publisher.statistics, file=sys.stderr)
 
 
 if __name__ == "__main__":
@@ -240,6 +426,24 @@ if __name__ == "__main__":
         help="the address of the MQTT server to connect to",
         metavar="[<proto>://][<user>@]<hostname>[:<port>]/<discovery prefix>",
     )
+    parser.add_argument(
+        "--overflow",
+        choices=["drop_newest", "drop_oldest"],
+        default="drop_oldest",
+        help="which readings to discard when the MQTT server falls behind",
+    )
+    parser.add_argument(
+        "--queue",
+        default=64,
+        type=int,
+        help="the maximum number of readings waiting to be published",
+    )
+    parser.add_argument(
+        "--stats",
+        type=float,
+        help="print publishing queue statistics this often",
+        metavar="SECONDS",
+    )
     parser.add_argument(
         "addr",
         nargs="?",
@@ -252,4 +456,13 @@ if __name__ == "__main__":
     if parsed.addr is None:
         asyncio.run(utils.scan())
     else:
-        asyncio.run(run(parsed.mqtt, parsed.ca, parsed.addr))
+        asyncio.run(
+            run(
+                parsed.mqtt,
+                parsed.ca,
+                parsed.addr,
+                parsed.queue,
+                ens_c551s.overflow[parsed.overflow],
+                parsed.stats,
+            )
+        )
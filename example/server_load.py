@@ -0,0 +1,185 @@
+from __future__ import annotations
+import argparse
+import asyncio
+import base64
+import ens_c551s
+import json
+import math
+import os
+import random
+import socket
+import statistics
+import struct
+import sys
+import time
+import typing
+from ens_c551s.protocol import protocol
+
+
+class simulated_scale:
+    __event: asyncio.Event
+    __is_connected: bool
+    __listeners: list[typing.Callable[[protocol.state], None]]
+
+    @property
+    def is_connected(self: simulated_scale) -> bool:
+        return self.__is_connected
+
+    def __init__(self: simulated_scale) -> None:
+        self.__event = asyncio.Event()
+        self.__is_connected = True
+        self.__listeners = []
+
+    def add_listener(
+        self: simulated_scale, callback: typing.Callable[[protocol.state], None]
+    ) -> None:
+        self.__listeners.append(callback)
+
+    def remove_listener(
+        self: simulated_scale, callback: typing.Callable[[protocol.state], None]
+    ) -> None:
+        if callback in self.__listeners:
+            self.__listeners.remove(callback)
+
+    async def run(self: simulated_scale, rate: float, duration: float) -> None:
+        start = time.monotonic()
+        phase = random.random() * math.tau
+        while time.monotonic() - start < duration:
+            t = time.monotonic() - start
+            state = protocol.state(
+                True,
+                abs(math.cos(t + phase)) < 0.1,
+                ens_c551s.unit.gram,
+                round(500.0 + 400.0 * math.sin(t + phase), 1),
+                time.perf_counter(),
+            )
+            for listener in tuple(self.__listeners):
+                listener(state)
+            self.__event.set()
+            await asyncio.sleep(1.0 / rate)
+        self.__is_connected = False
+        self.__event.set()
+
+    async def wait(self: simulated_scale) -> None:
+        await self.__event.wait()
+        self.__event.clear()
+
+
+async def viewer(port: int, websocket: bool, latencies: list[float]) -> int:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    if websocket:
+        key = base64.b64encode(os.urandom(16))
+        writer.write(
+            b"GET /ws HTTP/1.1\r\nHost: localhost\r\nUpgrade: websocket\r\n"
+            b"Connection: Upgrade\r\nSec-WebSocket-Version: 13\r\n"
+            b"Sec-WebSocket-Key: " + key + b"\r\n\r\n"
+        )
+    else:
+        writer.write(b"GET /events HTTP/1.1\r\nHost: localhost\r\n\r\n")
+    await reader.readuntil(b"\r\n\r\n")
+    received = 0
+    try:
+        while True:
+            if websocket:
+                _, length = await reader.readexactly(2)
+                if length == 126:
+                    (length,) = struct.unpack("!H", await reader.readexactly(2))
+                payload = await reader.readexactly(length)
+            else:
+                event = await reader.readuntil(b"\n\n")
+                payload = event.split(b"data: ", 1)[1]
+            latencies.append(time.time() - json.loads(payload)["time"])
+            received += 1
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+    return received
+
+
+async def stalled_viewer(port: int) -> None:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 0x1000)
+    sock.setblocking(False)
+    loop = asyncio.get_running_loop()
+    try:
+        await loop.sock_connect(sock, ("127.0.0.1", port))
+        await loop.sock_sendall(
+            sock, b"GET /events HTTP/1.1\r\nHost: localhost\r\n\r\n"
+        )
+        await asyncio.sleep(math.inf)
+    finally:
+        sock.close()
+
+
+async def run(
+    scales: int,
+    viewers: int,
+    stalled: int,
+    rate: float,
+    duration: float,
+    policy: ens_c551s.overflow,
+) -> None:
+    async with ens_c551s.server(port=0, policy=policy, send_buffer=0x1000) as srv:
+        latencies: list[float] = []
+        clients = [
+            asyncio.ensure_future(viewer(srv.port, i % 2 == 1, latencies))
+            for i in range(viewers)
+        ]
+        stalls = [
+            asyncio.ensure_future(stalled_viewer(srv.port)) for _ in range(stalled)
+        ]
+        await asyncio.sleep(0.5)
+        print(f"{srv.statistics.clients} clients connected", file=sys.stderr)
+        sims = [simulated_scale() for _ in range(scales)]
+        for i, sim in enumerate(sims):
+            srv.attach(f"scale{i}", sim)  # pyright: ignore[reportArgumentType]
+        await asyncio.gather(*(sim.run(rate, duration) for sim in sims))
+        await asyncio.sleep(0.5)
+        stats = srv.statistics
+    received = await asyncio.gather(*clients)
+    for stall in stalls:
+        stall.cancel()
+    await asyncio.gather(*stalls, return_exceptions=True)
+    latencies.sort()
+    print(f"Published {stats.published} readings to {viewers} viewers")
+    print(f"Delivered {sum(received)} messages ({min(received)} min per viewer)")
+    print(f"Dropped {stats.dropped} frames, disconnected {stats.disconnected} clients")
+    if policy == ens_c551s.overflow.disconnect:
+        print(f"{stats.disconnected} of {stalled} stalled viewers were disconnected")
+    else:
+        print(f"{stats.dropped} frames were skipped for {stalled} stalled viewers")
+    if len(latencies) > 0:
+        print(
+            f"Latency p50 = {statistics.median(latencies) * 1000:.2f} ms, "
+            f"p99 = {latencies[int(len(latencies) * 0.99)] * 1000:.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="load test the live weight server with simulated scales"
+    )
+    parser.add_argument("--scales", default=4, type=int, help="simulated scales")
+    parser.add_argument("--viewers", default=400, type=int, help="reading clients")
+    parser.add_argument("--stalled", default=10, type=int, help="non-reading clients")
+    parser.add_argument("--rate", default=10.0, type=float, help="readings per second")
+    parser.add_argument("--duration", default=10.0, type=float, help="seconds")
+    parser.add_argument(
+        "--overflow",
+        choices=["disconnect", "drop_oldest"],
+        default="disconnect",
+        help="what to do with viewers that fall behind",
+    )
+    parsed = parser.parse_args()
+
+    asyncio.run(
+        run(
+            parsed.scales,
+            parsed.viewers,
+            parsed.stalled,
+            parsed.rate,
+            parsed.duration,
+            ens_c551s.overflow[parsed.overflow],
+        )
+    )
@@ -0,0 +1,83 @@
+from __future__ import annotations
+import asyncio
+import math
+import struct
+import time
+import typing
+from ens_c551s import consts
+
+
+class simulated_client:
+    rates: dict[str, float] = {}
+
+    __adapter: str | None
+    __addr: str
+    __callback: typing.Callable[[typing.Any, bytearray], None] | None
+    __disconnected: typing.Callable[[simulated_client], None]
+    __task: asyncio.Task[None] | None
+
+    @property
+    def adapter(self: simulated_client) -> str | None:
+        return self.__adapter
+
+    @property
+    def address(self: simulated_client) -> str:
+        return self.__addr
+
+    def __init__(
+        self: simulated_client,
+        addr: str,
+        disconnected_callback: typing.Callable[[simulated_client], None],
+        adapter: str | None = None,
+    ) -> None:
+        self.__adapter = adapter
+        self.__addr = addr
+        self.__callback = None
+        self.__disconnected = disconnected_callback
+        self.__task = None
+
+    async def connect(self: simulated_client) -> None:
+        await asyncio.sleep(0.01)
+
+    async def disconnect(self: simulated_client) -> None:
+        if self.__task is not None:
+            self.__task.cancel()
+            self.__task = None
+        self.__disconnected(self)
+
+    async def read_gatt_char(self: simulated_client, char: str) -> bytearray:
+        return bytearray(b"simulated")
+
+    async def start_notify(
+        self: simulated_client,
+        char: str,
+        callback: typing.Callable[[typing.Any, bytearray], None],
+    ) -> None:
+        self.__callback = callback
+        if self.__task is None:
+            self.__task = asyncio.get_running_loop().create_task(self.__notify())
+
+    async def stop_notify(self: simulated_client, char: str) -> None:
+        if self.__task is not None:
+            self.__task.cancel()
+            self.__task = None
+
+    async def write_gatt_char(
+        self: simulated_client, char: str, data: bytearray
+    ) -> None:
+        await asyncio.sleep(0.001)
+
+    async def __notify(self: simulated_client) -> None:
+        period = 1.0 / simulated_client.rates.get(self.__addr, 10.0)
+        start = time.monotonic()
+        while True:
+            t = time.monotonic() - start
+            weight = int(5000 + 4000 * math.sin(t))
+            frame = bytearray(consts.MAGIC_HEADER + bytes(14))
+            struct.pack_into("<H", frame, 7, consts.command.weight.value)
+            struct.pack_into(
+                "<BHH?", frame, 10, 0, weight, consts.unit.gram.value, t % 4 < 1
+            )
+            if self.__callback is not None:
+                self.__callback(None, frame)
+            await asyncio.sleep(period)
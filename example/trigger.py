@@ -0,0 +1,74 @@
+from __future__ import annotations
+import argparse
+import asyncio
+import ens_c551s
+import sys
+from ens_c551s.protocol import protocol
+from . import utils
+
+
+async def dose(addr: str, target: float, hysteresis: float, stable: bool) -> None:
+    print(f"Connecting to {addr}...", file=sys.stderr)
+    async with ens_c551s.device(addr) as dev:
+
+        def reached(trg: ens_c551s.trigger, state: protocol.state) -> None:
+            print(f"Reached {state.weight} g (latency {trg.latency * 1e6:.0f} us)")
+
+        def emptied(trg: ens_c551s.trigger, state: protocol.state) -> None:
+            print(f"Dropped to {state.weight} g (latency {trg.latency * 1e6:.0f} us)")
+
+        rising = dev.add_trigger(
+            target, ens_c551s.crossing.rising, reached, hysteresis, stable
+        )
+        falling = dev.add_trigger(
+            target, ens_c551s.crossing.falling, emptied, hysteresis, stable
+        )
+        print(f"Waiting for the weight to cross {target} g", file=sys.stderr)
+        try:
+            while dev.is_connected:
+                await dev.wait()
+        except asyncio.exceptions.CancelledError:
+            pass
+        finally:
+            for trg in (rising, falling):
+                dev.remove_trigger(trg)
+                print(
+                    f"{trg.direction.name}: fired {trg.fired} times, "
+                    f"mean latency {trg.mean_latency * 1e6:.0f} us, "
+                    f"max latency {trg.max_latency * 1e6:.0f} us",
+                    file=sys.stderr,
+                )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="example ENS-C551S program reacting to weight thresholds"
+    )
+    parser.add_argument(
+        "--hysteresis",
+        default=1.0,
+        type=float,
+        help="how far the weight must move back before firing again",
+        metavar="GRAMS",
+    )
+    parser.add_argument(
+        "--stable",
+        action="store_true",
+        help="only fire once the scale reports a stable reading",
+    )
+    parser.add_argument(
+        "--target", default=100.0, type=float, help="the threshold", metavar="GRAMS"
+    )
+    parser.add_argument(
+        "addr",
+        nargs="?",
+        type=utils.ble_mac,
+        help="the BLE MAC address of the scale to connect to",
+        metavar="XX:XX:XX:XX:XX:XX",
+    )
+    parsed = parser.parse_args()
+
+    if parsed.addr is None:
+        asyncio.run(utils.scan())
+    else:
+        asyncio.run(dose(parsed.addr, parsed.target, parsed.hysteresis, parsed.stable))